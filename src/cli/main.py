@@ -15,6 +15,8 @@ def main():
     parser.add_argument('--lang', default=None, help='Source language (auto, en, zh-cn, etc.)')
     parser.add_argument('--format', default='srt', help='Subtitle format (srt, vtt, json, raw)')
     parser.add_argument('--device', default=None, help='Device to use (cpu, cuda)')
+    parser.add_argument('--backend', default=None, help='ASR backend (whisper, faster-whisper)')
+    parser.add_argument('--vad', action='store_true', help='Split long audio at silences detected by Silero VAD')
     parser.add_argument('--output', default=None, help='Output file path')
 
     # Translation arguments
@@ -38,6 +40,10 @@ def main():
         config.language = args.lang
     if args.device:
         config.device = args.device
+    if args.backend:
+        config.backend = args.backend
+    if args.vad:
+        config.vad = True
     if args.translate:
         config.translation.enabled = True
     if args.target_lang:
@@ -13,6 +13,7 @@ class TranslationConfig:
     api_url: str = ''
     model: str = ''
     bilingual: bool = False
+    max_concurrent: int = 5
 
 @dataclass
 class DiarizationConfig:
@@ -24,6 +25,8 @@ class AppConfig:
     language: str = 'auto'
     model_name: str = 'medium'
     device: str = 'auto'
+    backend: str = 'whisper'
+    vad: bool = False
     translation: TranslationConfig = None
     diarization: DiarizationConfig = None
 
@@ -37,6 +40,7 @@ class ConfigManager:
     def __init__(self, settings_path: str = 'settings.ini'):
         self.settings_path = settings_path
         self.config = AppConfig()
+        self.dirty = False
         self._load_config()
 
     def _load_config(self):
@@ -47,6 +51,8 @@ class ConfigManager:
                 parser.read(self.settings_path, encoding='utf-8')
             except Exception as e:
                 print(f"Warning: Failed to read settings.ini: {e}")
+        else:
+            self.dirty = True
 
         # Load DEFAULT section
         if 'DEFAULT' in parser:
@@ -54,6 +60,8 @@ class ConfigManager:
             self.config.language = default.get('Language', 'auto')
             self.config.model_name = default.get('Mode', 'medium')
             self.config.device = default.get('Device', 'auto')
+            self.config.backend = default.get('Backend', 'whisper')
+            self.config.vad = default.getboolean('VAD', False)
 
         # Load TRANSLATION section
         if 'TRANSLATION' in parser:
@@ -65,6 +73,7 @@ class ConfigManager:
             self.config.translation.api_url = trans.get('APIUrl', '')
             self.config.translation.model = trans.get('Model', '')
             self.config.translation.bilingual = trans.getboolean('Bilingual', False)
+            self.config.translation.max_concurrent = trans.getint('MaxConcurrent', 5)
 
         # Load DIARIZATION section
         if 'DIARIZATION' in parser:
@@ -72,16 +81,34 @@ class ConfigManager:
             self.config.diarization.enabled = diar.getboolean('Enable', False)
             self.config.diarization.hf_token = diar.get('HFToken', '')
 
-        # Save back to ensure defaults exist
-        self.save_config()
+        # Save back only if some default is missing from the file
+        if not self.dirty:
+            self.dirty = self._has_missing_keys(parser)
+        if self.dirty:
+            self.save_config()
 
-    def save_config(self):
+    def _has_missing_keys(self, parser: configparser.ConfigParser) -> bool:
+        expected = self._build_parser()
+        for section in expected:
+            if section == 'DEFAULT':
+                present = parser.defaults()
+            elif section in parser:
+                present = parser[section]
+            else:
+                return True
+            if any(key not in present for key in expected[section]):
+                return True
+        return False
+
+    def _build_parser(self) -> configparser.ConfigParser:
         parser = configparser.ConfigParser()
         
         parser['DEFAULT'] = {
             'Language': self.config.language,
             'Mode': self.config.model_name,
-            'Device': self.config.device
+            'Device': self.config.device,
+            'Backend': self.config.backend,
+            'VAD': str(self.config.vad)
         }
 
         parser['TRANSLATION'] = {
@@ -91,7 +118,8 @@ class ConfigManager:
             'APIKey': self.config.translation.api_key,
             'APIUrl': self.config.translation.api_url,
             'Model': self.config.translation.model,
-            'Bilingual': str(self.config.translation.bilingual)
+            'Bilingual': str(self.config.translation.bilingual),
+            'MaxConcurrent': str(self.config.translation.max_concurrent)
         }
 
         parser['DIARIZATION'] = {
@@ -99,9 +127,15 @@ class ConfigManager:
             'HFToken': self.config.diarization.hf_token
         }
 
+        return parser
+
+    def save_config(self):
+        parser = self._build_parser()
+
         try:
             with open(self.settings_path, 'w', encoding='utf-8') as f:
                 parser.write(f)
+            self.dirty = False
         except Exception as e:
             print(f"Warning: Failed to write settings.ini: {e}")
 
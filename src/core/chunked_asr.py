@@ -1,42 +1,63 @@
-import os
-from typing import List, Dict, Any
-from pydub import AudioSegment
-import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Dict, Any, Tuple
+import numpy as np
 
 class ChunkedASR:
     """
     Handles splitting of long audio files for ASR processing.
     Inspired by VideoCaptioner's ChunkedASR.
     """
-    def __init__(self, engine, chunk_length_ms=600000, overlap_ms=10000):
+    def __init__(self, engine, chunk_length_ms=600000, overlap_ms=10000, max_workers=4, gpu_concurrency=1,
+                 vad=False, vad_bundle_ms=30000):
         """
         :param engine: The WhisperEngine instance
         :param chunk_length_ms: Length of each chunk in ms (default 10 mins)
         :param overlap_ms: Overlap between chunks in ms (default 10s)
+        :param max_workers: Number of chunks prepared concurrently (default 4)
+        :param gpu_concurrency: Number of engine.transcribe calls allowed at once (default 1).
+                                Keep at 1 for a single local GPU to avoid VRAM OOM;
+                                raise it for multi-GPU or API-backed engines.
+        :param vad: Cut long in-memory audio at silences found by Silero VAD instead of
+                    fixed overlapping windows (default False)
+        :param vad_bundle_ms: Target length of each VAD chunk in ms (default 30s, Whisper's window)
         """
         self.engine = engine
         self.chunk_length_ms = chunk_length_ms
         self.overlap_ms = overlap_ms
+        self.max_workers = max_workers
+        self._engine_semaphore = threading.Semaphore(gpu_concurrency)
+        self.vad = vad
+        self.vad_bundle_ms = vad_bundle_ms
+        self._vad_model = None
+        self._vad_utils = None
 
-    def transcribe(self, audio_path: str, language: str = 'auto') -> Dict[str, Any]:
+    def _merge_chunks(self, chunks: List[tuple], results: Dict[int, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
         """
-        Transcribe audio file, splitting if necessary.
+        Merge per-chunk segments, dropping the duplicates produced by overlapping chunks.
+
+        Each overlap region is transcribed by both neighbouring chunks. Cut it at its
+        midpoint: the earlier chunk keeps segments starting before the cut, the later
+        chunk keeps segments starting at or after it. Whisper is least reliable near the
+        edges of its input, so the midpoint keeps each chunk's most confident half.
+        VAD chunks do not overlap, so there the cut falls in the silence between them.
         """
-        try:
-            audio = AudioSegment.from_file(audio_path)
-        except Exception as e:
-            print(f"Error loading audio with pydub: {e}")
-            print("Falling back to direct transcription.")
-            return self.engine.transcribe(audio_path, language)
-
-        duration_ms = len(audio)
-        
-        # If audio is short enough, just transcribe directly
-        if duration_ms <= self.chunk_length_ms:
-            return self.engine.transcribe(audio_path, language)
+        all_segments = []
+        for i, (start, end) in enumerate(chunks):
+            lower = (start + chunks[i - 1][1]) / 2000.0 if i > 0 else float('-inf')
+            upper = (chunks[i + 1][0] + end) / 2000.0 if i < len(chunks) - 1 else float('inf')
+            for segment in results[i]:
+                if lower <= segment['start'] < upper:
+                    all_segments.append(segment)
 
-        print(f"Audio duration: {duration_ms/1000:.2f}s. Splitting into chunks...")
-        
+        # Sort segments by start time
+        all_segments.sort(key=lambda x: x['start'])
+        return all_segments
+
+    def _split(self, duration_ms: int) -> List[Tuple[int, int]]:
+        """
+        Compute overlapping (start_ms, end_ms) chunk ranges covering the audio.
+        """
         chunks = []
         start = 0
         while start < duration_ms:
@@ -45,57 +66,120 @@ class ChunkedASR:
             if end == duration_ms:
                 break
             start += self.chunk_length_ms - self.overlap_ms
+        return chunks
 
-        all_segments = []
-        
-        # Process chunks
-        # Note: For local Whisper, we process sequentially to avoid VRAM OOM.
-        # If we had multiple GPUs or API, we could parallelize.
-        for i, (start, end) in enumerate(chunks):
+    def _vad_split(self, samples: np.ndarray, sample_rate: int) -> List[Tuple[int, int]]:
+        """
+        Group Silero VAD speech regions into (start_ms, end_ms) chunks of roughly
+        vad_bundle_ms, cutting only in silence. A single speech region longer than
+        the bundle becomes its own chunk.
+        """
+        import torch
+
+        if self._vad_model is None:
+            print("Loading Silero VAD model...")
+            self._vad_model, self._vad_utils = torch.hub.load('snakers4/silero-vad', 'silero_vad', trust_repo=True)
+        get_speech_timestamps = self._vad_utils[0]
+
+        speech = get_speech_timestamps(
+            torch.from_numpy(samples),
+            self._vad_model,
+            sampling_rate=sample_rate,
+            min_silence_duration_ms=500
+        )
+
+        chunks = []
+        bundle_start = bundle_end = None
+        for region in speech:
+            start_ms = region['start'] * 1000 // sample_rate
+            end_ms = region['end'] * 1000 // sample_rate
+            if bundle_start is None:
+                bundle_start, bundle_end = start_ms, end_ms
+            elif end_ms - bundle_start <= self.vad_bundle_ms:
+                bundle_end = end_ms
+            else:
+                chunks.append((bundle_start, bundle_end))
+                bundle_start, bundle_end = start_ms, end_ms
+        if bundle_start is not None:
+            chunks.append((bundle_start, bundle_end))
+        return chunks
+
+    def _transcribe_chunks(self, chunks: List[Tuple[int, int]], read_chunk: Callable[[int, int], np.ndarray],
+                           language: str) -> Dict[str, Any]:
+        """
+        Transcribe each chunk concurrently and merge the results in chunk order.
+
+        :param read_chunk: Returns the 16kHz mono float32 samples for (start_ms, end_ms)
+        """
+        def _process_chunk(i: int, start: int, end: int):
             print(f"Processing chunk {i+1}/{len(chunks)}: {start/1000:.1f}s - {end/1000:.1f}s")
             
-            chunk_audio = audio[start:end]
-            
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-                chunk_audio.export(tmp.name, format="wav")
-                tmp_path = tmp.name
+            # Whisper accepts 16kHz mono float32 arrays directly, so hand it the
+            # decoded samples instead of round-tripping through a temp WAV.
+            samples = read_chunk(start, end)
 
-            try:
-                result = self.engine.transcribe(tmp_path, language)
+            # Slicing overlaps across workers, but only gpu_concurrency
+            # chunks hit the model at the same time.
+            with self._engine_semaphore:
+                result = self.engine.transcribe(samples, language)
+
+            # Adjust timestamps
+            offset_sec = start / 1000.0
+            segments = []
+            for segment in result.get('segments', []):
+                segment['start'] += offset_sec
+                segment['end'] += offset_sec
                 
-                # Adjust timestamps
-                offset_sec = start / 1000.0
-                for segment in result.get('segments', []):
-                    # Skip segments in the overlap area if they are not the last chunk
-                    # This is a simplified merge strategy. 
-                    # A robust one would check for duplicate text.
-                    seg_start = segment['start'] + offset_sec
-                    seg_end = segment['end'] + offset_sec
-                    
-                    # Simple overlap handling:
-                    # If it's not the first chunk, ignore segments that start before the overlap region ends
-                    # (This is tricky without complex alignment, so we just append all and sort/filter later if needed)
-                    # For now, we just trust Whisper's timestamps and shift them.
-                    
-                    segment['start'] = seg_start
-                    segment['end'] = seg_end
-                    
-                    # Adjust word timestamps if available
-                    if 'words' in segment:
-                        for word in segment['words']:
-                            word['start'] += offset_sec
-                            word['end'] += offset_sec
-                            
-                    all_segments.append(segment)
-                    
-            finally:
-                os.unlink(tmp_path)
+                # Adjust word timestamps if available
+                if 'words' in segment:
+                    for word in segment['words']:
+                        word['start'] += offset_sec
+                        word['end'] += offset_sec
+                        
+                segments.append(segment)
 
-        # Sort segments by start time
-        all_segments.sort(key=lambda x: x['start'])
+            return i, segments
+
+        # Process chunks concurrently, then reassemble in chunk order
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(_process_chunk, i, start, end) for i, (start, end) in enumerate(chunks)]
+            for future in as_completed(futures):
+                i, segments = future.result()
+                results[i] = segments
+
+        all_segments = self._merge_chunks(chunks, results)
         
         return {
             "text": " ".join([s['text'] for s in all_segments]),
             "segments": all_segments,
             "language": language # Simplified
         }
+
+    def transcribe_array(self, samples: np.ndarray, sample_rate: int = 16000, language: str = 'auto') -> Dict[str, Any]:
+        """
+        Transcribe an already decoded 16kHz mono float32 waveform, splitting if necessary.
+
+        Chunks are numpy views into the waveform, so no further decoding is done.
+        """
+        if sample_rate != 16000:
+            raise ValueError(f"Whisper expects 16kHz audio, got {sample_rate}Hz")
+
+        duration_ms = len(samples) * 1000 // sample_rate
+
+        # If audio is short enough, just transcribe directly
+        if duration_ms <= self.chunk_length_ms:
+            return self.engine.transcribe(samples, language)
+
+        if self.vad:
+            print(f"Audio duration: {duration_ms/1000:.2f}s. Splitting into chunks at silences...")
+            chunks = self._vad_split(samples, sample_rate)
+            if not chunks:
+                print("No speech detected.")
+                return {"text": "", "segments": [], "language": language}
+        else:
+            print(f"Audio duration: {duration_ms/1000:.2f}s. Splitting into chunks...")
+            chunks = self._split(duration_ms)
+        return self._transcribe_chunks(
+            chunks, lambda start, end: samples[start * sample_rate // 1000:end * sample_rate // 1000], language
+        )
@@ -1,8 +1,42 @@
-import torch
-from typing import List, Dict, Any
-import os
-import tempfile
-from pydub import AudioSegment
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Dict, Any, Union
+
+@dataclass
+class Turns:
+    """
+    Speaker turns stored as parallel arrays (start, end, speaker), sorted by start time.
+    """
+    start: np.ndarray
+    end: np.ndarray
+    speaker: np.ndarray
+
+    @classmethod
+    def from_lists(cls, starts: List[float], ends: List[float], speakers: List[str]) -> 'Turns':
+        start = np.asarray(starts, dtype=np.float64)
+        order = np.argsort(start, kind='stable')
+        return cls(
+            start=start[order],
+            end=np.asarray(ends, dtype=np.float64)[order],
+            speaker=np.asarray(speakers, dtype=object)[order],
+        )
+
+    @classmethod
+    def from_dicts(cls, turns: List[Dict[str, Any]]) -> 'Turns':
+        return cls.from_lists(
+            [t['start'] for t in turns],
+            [t['end'] for t in turns],
+            [t['speaker'] for t in turns],
+        )
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [
+            {"start": float(s), "end": float(e), "speaker": spk}
+            for s, e, spk in zip(self.start, self.end, self.speaker)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.start)
 
 class SpeakerDiarizer:
     def __init__(self, hf_token: str, device: str = 'auto'):
@@ -10,7 +44,9 @@ class SpeakerDiarizer:
         self.device = self._get_device(device)
         self.pipeline = None
 
-    def _get_device(self, device: str) -> torch.device:
+    def _get_device(self, device: str) -> 'torch.device':
+        # Deferred so importing this module does not pull in torch
+        import torch
         if device == 'auto':
             return torch.device("cuda" if torch.cuda.is_available() else "cpu")
         return torch.device(device)
@@ -39,24 +75,28 @@ class SpeakerDiarizer:
             print(f"Error loading diarization pipeline: {e}")
             raise
 
-    def diarize(self, audio_path: str) -> List[Dict[str, Any]]:
+    def diarize(self, audio: Union[str, np.ndarray], sample_rate: int = 16000) -> Turns:
+        """
+        Diarize a file path or a mono float32 waveform sampled at sample_rate.
+        """
         if self.pipeline is None:
             self.load_pipeline()
 
         print("Running speaker diarization...")
         try:
-            # pyannote expects a file path
-            diarization = self.pipeline(audio_path)
+            # pyannote takes a file path or an in-memory (channel, time) waveform
+            if isinstance(audio, np.ndarray):
+                import torch
+                audio = {"waveform": torch.from_numpy(audio).unsqueeze(0), "sample_rate": sample_rate}
+            diarization = self.pipeline(audio)
             
-            results = []
+            starts, ends, speakers = [], [], []
             for turn, _, speaker in diarization.itertracks(yield_label=True):
-                results.append({
-                    "start": turn.start,
-                    "end": turn.end,
-                    "speaker": speaker
-                })
+                starts.append(turn.start)
+                ends.append(turn.end)
+                speakers.append(speaker)
             
-            return results
+            return Turns.from_lists(starts, ends, speakers)
         except Exception as e:
             print(f"Diarization failed: {e}")
-            return []
+            return Turns.from_lists([], [], [])
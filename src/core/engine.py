@@ -1,19 +1,34 @@
-import whisper
-import torch
-from typing import Dict, Any
+import numpy as np
+from typing import Dict, Any, Optional, Union
+
+# Chinese variants that Whisper only knows as "zh"
+_ZH_VARIANTS = frozenset({'zh-cn', 'zh-tw', 'zh-hk', 'zh-sg', 'zh-hans', 'zh-hant'})
 
 class WhisperEngine:
-    def __init__(self, model_name: str, device: str = 'auto'):
+    def __init__(self, model_name: str, device: str = 'auto', lazy: bool = False):
         self.model_name = model_name
         self.device = self._get_device(device)
         self.model = None
+        # Load eagerly so the first chunk does not pay model load latency
+        if not lazy:
+            self.load_model()
 
     def _get_device(self, device: str) -> str:
         if device == 'auto':
+            import torch
             return "cuda" if torch.cuda.is_available() else "cpu"
         return device
 
     def load_model(self):
+        # Heavy imports are deferred so the CLI starts quickly
+        import torch
+        import whisper
+
+        # Chunks are padded to fixed 30s windows, so cudnn autotuning pays off;
+        # TF32 matmuls speed up any fp32 work left on Ampere+ GPUs
+        torch.backends.cudnn.benchmark = True
+        torch.set_float32_matmul_precision('high')
+
         print(f"Loading openai-whisper model {self.model_name} on {self.device}...")
         try:
             self.model = whisper.load_model(self.model_name, device=self.device)
@@ -23,29 +38,102 @@ class WhisperEngine:
             self.device = "cpu"
             self.model = whisper.load_model(self.model_name, device="cpu")
 
-    def transcribe(self, audio_path: str, language: str = 'auto') -> Dict[str, Any]:
+    def _resolve_language(self, language: str) -> Optional[str]:
+        """
+        Map the configured language to a Whisper language code (None for auto-detect).
+        """
+        if language == 'auto':
+            return None
+        if language.lower() in _ZH_VARIANTS:
+            return "zh"
+        return language
+
+    def transcribe(self, audio: Union[str, np.ndarray], language: str = 'auto') -> Dict[str, Any]:
+        """
+        Transcribe a file path or a 16kHz mono float32 waveform.
+        """
         if not self.model:
             self.load_model()
 
-        lang_arg = None
-        if language != 'auto':
-            if language.lower() in ('zh-cn', 'zh-tw', 'zh-hk', 'zh-sg', 'zh-hans', 'zh-hant'):
-                lang_arg = "zh"
-            else:
-                lang_arg = language
+        lang_arg = self._resolve_language(language)
         
         print("Transcribing...")
         
         # openai-whisper transcribe options
         options = {
-            "word_timestamps": True
+            "word_timestamps": True,
+            "fp16": self.device.startswith("cuda")
         }
         if lang_arg:
             options["language"] = lang_arg
 
-        result = self.model.transcribe(audio_path, **options)
+        result = self.model.transcribe(audio, **options)
         
         for segment in result.get("segments", []):
             print(f"[{segment['start']:.2f}s -> {segment['end']:.2f}s] {segment['text']}")
 
         return result
+
+
+class FasterWhisperEngine(WhisperEngine):
+    """
+    Whisper engine backed by faster-whisper (CTranslate2) with int8 quantized weights.
+    Returns results in the same shape as openai-whisper's transcribe.
+    """
+    def _compute_type(self) -> str:
+        return "int8_float16" if self.device.startswith("cuda") else "int8"
+
+    def load_model(self):
+        from faster_whisper import WhisperModel
+
+        print(f"Loading faster-whisper model {self.model_name} on {self.device} ({self._compute_type()})...")
+        try:
+            self.model = WhisperModel(self.model_name, device=self.device, compute_type=self._compute_type())
+        except Exception as e:
+            print(f"Error loading model: {e}")
+            print("Falling back to CPU...")
+            self.device = "cpu"
+            self.model = WhisperModel(self.model_name, device="cpu", compute_type=self._compute_type())
+
+    def transcribe(self, audio: Union[str, np.ndarray], language: str = 'auto') -> Dict[str, Any]:
+        """
+        Transcribe a file path or a 16kHz mono float32 waveform.
+        """
+        if not self.model:
+            self.load_model()
+
+        print("Transcribing...")
+
+        segments_iter, info = self.model.transcribe(
+            audio,
+            language=self._resolve_language(language),
+            word_timestamps=True,
+            vad_filter=True
+        )
+
+        # Segments are generated lazily; decoding happens while iterating
+        segments = []
+        for segment in segments_iter:
+            segments.append({
+                "id": segment.id,
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "words": [
+                    {"word": w.word, "start": w.start, "end": w.end, "probability": w.probability}
+                    for w in (segment.words or [])
+                ]
+            })
+            print(f"[{segment.start:.2f}s -> {segment.end:.2f}s] {segment.text}")
+
+        return {
+            "text": "".join(s["text"] for s in segments),
+            "segments": segments,
+            "language": info.language
+        }
+
+
+ENGINES = {
+    'whisper': WhisperEngine,
+    'faster-whisper': FasterWhisperEngine,
+}
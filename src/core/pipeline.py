@@ -1,22 +1,31 @@
 import os
+import heapq
+import json
 import time
-import tempfile
 import subprocess
-from typing import List, Tuple, Dict, Any
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Dict, Any
+
+import numpy as np
 
 from ..config.settings import AppConfig
 from ..translation.factory import TranslatorFactory
-from ..utils.formatter import FORMATTERS
-from .engine import WhisperEngine
+from ..utils.formatter import FORMATTERS_STREAM
+from .engine import ENGINES
 from .chunked_asr import ChunkedASR
-from .diarizer import SpeakerDiarizer
+from .diarizer import SpeakerDiarizer, Turns
 
 class SubtitlePipeline:
     def __init__(self, config: AppConfig):
         self.config = config
-        self.engine = WhisperEngine(config.model_name, config.device)
+        engine_cls = ENGINES.get(config.backend)
+        if not engine_cls:
+            print(f"Warning: Backend {config.backend} not supported, using whisper.")
+            engine_cls = ENGINES['whisper']
+        self.engine = engine_cls(config.model_name, config.device)
         # Initialize ChunkedASR wrapper
-        self.chunked_asr = ChunkedASR(self.engine)
+        self.chunked_asr = ChunkedASR(self.engine, vad=config.vad)
         self.translator = TranslatorFactory.create_translator(config.translation)
         
         self.diarizer = None
@@ -26,77 +35,202 @@ class SubtitlePipeline:
             else:
                 self.diarizer = SpeakerDiarizer(config.diarization.hf_token, config.device)
 
-    def _assign_speakers(self, segments: List[Dict[str, Any]], diarization_result: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _probe(self, path: str) -> Optional[Dict[str, Any]]:
+        """
+        Return codec_name, sample_rate and channels of the first audio stream via ffprobe,
+        or None if the file cannot be probed.
+        """
+        cmd = [
+            "ffprobe",
+            "-v",
+            "error",
+            "-select_streams",
+            "a:0",
+            "-show_entries",
+            "stream=sample_rate,channels,codec_name",
+            "-of",
+            "json",
+            path,
+        ]
+        try:
+            proc = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, text=True)
+            streams = json.loads(proc.stdout).get("streams", [])
+        except (OSError, ValueError, subprocess.CalledProcessError):
+            return None
+        return streams[0] if streams else None
+
+    def _is_normalized_wav(self, path: str) -> bool:
+        """
+        Check whether the input already is the 16kHz mono 16-bit PCM WAV ffmpeg would produce.
+        """
+        if not path.lower().endswith(".wav"):
+            return False
+        info = self._probe(path)
+        return (
+            info is not None
+            and info.get("codec_name") == "pcm_s16le"
+            and int(info.get("sample_rate", 0)) == 16000
+            and int(info.get("channels", 0)) == 1
+        )
+
+    def _load_audio(self, filename: str) -> np.ndarray:
+        """
+        Decode the input to a 16kHz mono float32 waveform in memory.
+        """
+        if self._is_normalized_wav(filename):
+            try:
+                samples = self._read_wav(filename)
+                print("Input is already 16kHz mono PCM WAV, skipping ffmpeg conversion...")
+                return samples
+            except wave.Error as e:
+                # e.g. WAVE_FORMAT_EXTENSIBLE headers, which the wave module rejects before 3.12
+                print(f"Cannot read WAV directly ({e}), falling back to ffmpeg...")
+
+        print("Decoding audio via ffmpeg for consistent processing...")
+        # Explicit ffmpeg conversion, piped as raw PCM instead of a temp WAV:
+        # - mono (-ac 1)
+        # - 16kHz (-ar 16000)
+        # - disable video (-vn)
+        # - signed 16-bit little-endian samples to stdout (-f s16le -)
+        cmd = [
+            "ffmpeg",
+            "-loglevel",
+            "error",
+            "-i",
+            filename,
+            "-ac",
+            "1",
+            "-ar",
+            "16000",
+            "-vn",
+            "-f",
+            "s16le",
+            "-",
+        ]
+        try:
+            proc = subprocess.run(cmd, check=True, stdout=subprocess.PIPE)
+        except FileNotFoundError as e:
+            raise RuntimeError(
+                "ffmpeg not found in PATH. Please install ffmpeg and ensure it is available as `ffmpeg`."
+            ) from e
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError("ffmpeg failed to decode input audio. See ffmpeg output above.") from e
+        samples = np.frombuffer(proc.stdout, np.int16).astype(np.float32)
+        # Release the raw PCM and scale in place, so at most one int16 and one
+        # float32 copy of the audio are alive at once
+        del proc
+        samples /= 32768.0
+        return samples
+
+    def _read_wav(self, path: str) -> np.ndarray:
+        """
+        Read a 16kHz mono 16-bit PCM WAV file into a float32 array in [-1, 1].
+        Raises wave.Error if the file is in any other layout.
+        """
+        with wave.open(path, 'rb') as wav:
+            if wav.getsampwidth() != 2 or wav.getnchannels() != 1 or wav.getframerate() != 16000:
+                raise wave.Error(
+                    f"expected 16kHz mono 16-bit PCM, got {wav.getframerate()}Hz, "
+                    f"{wav.getnchannels()} channel(s), {wav.getsampwidth() * 8}-bit"
+                )
+            frames = wav.readframes(wav.getnframes())
+        samples = np.frombuffer(frames, np.int16).astype(np.float32)
+        del frames
+        samples /= 32768.0
+        return samples
+
+    def _assign_speakers(self, segments: List[Dict[str, Any]], turns: Turns) -> List[Dict[str, Any]]:
         """
         Assign speaker labels to Whisper segments based on pyannote diarization results.
         
         Strategy: 
         - Keep Whisper's segment boundaries intact (Whisper already does sentence-level segmentation).
-        - For each segment, find the pyannote speaker with the longest time overlap.
+        - For each segment, find the pyannote speaker with the longest total time overlap.
         - This prevents breaking natural sentence boundaries due to brief speaker jitter.
+
+        Segments and turns are swept in start order while a heap keyed on end time
+        holds the turns still live, so each segment only visits turns that have not
+        finished before it starts, however long an earlier turn runs.
         """
-        if not diarization_result:
+        if not len(turns):
             return segments
 
-        # Sort diarization results by start time for efficient processing
-        diarization_result = sorted(diarization_result, key=lambda x: x['start'])
+        # Turns arrive sorted by start time
+        dia_starts = turns.start
+        dia_ends = turns.end
+        dia_speakers = turns.speaker
+        num_turns = len(turns)
+        # Turns may overlap, so ends are not sorted. For the gap fallback, remember
+        # which turn has the latest end among each prefix (the earliest one on ties).
+        dia_max_end_idx = np.empty(num_turns, dtype=np.intp)
+        best = 0
+        for k in range(num_turns):
+            if dia_ends[k] > dia_ends[best]:
+                best = k
+            dia_max_end_idx[k] = best
 
-        def find_best_speaker_for_segment(seg_start: float, seg_end: float) -> str:
+        def find_nearest_speaker(seg_start: float, seg_end: float) -> str:
             """
-            Find the speaker whose diarization turn has the longest overlap with [seg_start, seg_end].
-            
-            If no overlap exists (segment falls in a diarization gap), find the nearest speaker
-            within a reasonable distance (2 seconds).
-            
-            Returns speaker label or None.
-            """
-            best_speaker = None
-            best_overlap_duration = 0.0
-
-            # First pass: find speaker with maximum overlap
-            for dia in diarization_result:
-                overlap_start = max(seg_start, dia['start'])
-                overlap_end = min(seg_end, dia['end'])
-                overlap_duration = max(0.0, overlap_end - overlap_start)
-
-                if overlap_duration > best_overlap_duration:
-                    best_overlap_duration = overlap_duration
-                    best_speaker = dia['speaker']
+            Find the nearest speaker for a segment that falls in a diarization gap,
+            within a reasonable distance (2 seconds) of the segment midpoint.
 
-            # If we found an overlap, return that speaker
-            if best_overlap_duration > 0:
-                return best_speaker
+            Only two turns can be nearest: the first one starting after the midpoint,
+            and the latest-ending one among those starting at or before it. Both are
+            found by binary search.
 
-            # No overlap found - segment is in a gap between diarization turns
-            # Find the nearest diarization turn (by distance to segment midpoint)
+            Returns speaker label or None.
+            """
             seg_midpoint = (seg_start + seg_end) / 2
-            min_distance = float('inf')
-            nearest_speaker = None
-
-            for dia in diarization_result:
-                # Calculate distance from segment midpoint to diarization turn
-                if dia['start'] <= seg_midpoint < dia['end']:
-                    # Midpoint is inside this turn (shouldn't happen if overlap was 0, but just in case)
-                    return dia['speaker']
-                elif seg_midpoint < dia['start']:
-                    distance = dia['start'] - seg_midpoint
-                else:  # seg_midpoint >= dia['end']
-                    distance = seg_midpoint - dia['end']
+            idx = int(np.searchsorted(dia_starts, seg_midpoint, side='right'))
 
-                if distance < min_distance:
-                    min_distance = distance
-                    nearest_speaker = dia['speaker']
+            best_distance = float('inf')
+            nearest_speaker = None
+            if idx > 0:
+                # a midpoint inside a turn counts as distance 0
+                prev_idx = dia_max_end_idx[idx - 1]
+                best_distance = max(0.0, seg_midpoint - dia_ends[prev_idx])
+                nearest_speaker = dia_speakers[prev_idx]
+            if idx < num_turns and dia_starts[idx] - seg_midpoint < best_distance:
+                best_distance = dia_starts[idx] - seg_midpoint
+                nearest_speaker = dia_speakers[idx]
 
             # Only use nearest speaker if within 2 seconds
             max_gap_tolerance = 2.0
-            if min_distance <= max_gap_tolerance:
+            if best_distance <= max_gap_tolerance:
                 return nearest_speaker
 
             return None
 
-        # Assign speaker to each Whisper segment (keep segmentation intact)
-        for seg in segments:
-            speaker = find_best_speaker_for_segment(seg['start'], seg['end'])
+        # Assign speaker to each Whisper segment (keep segmentation intact).
+        # Labels are written onto the segment dicts, so the caller's order is untouched.
+        active = []  # (end, index) of turns started before the current segment ends
+        next_turn = 0
+        for seg in sorted(segments, key=lambda x: x['start']):
+            seg_start, seg_end = seg['start'], seg['end']
+
+            # Admit turns starting before this segment ends
+            while next_turn < num_turns and dia_starts[next_turn] < seg_end:
+                heapq.heappush(active, (dia_ends[next_turn], next_turn))
+                next_turn += 1
+
+            # Retire turns that ended before this segment starts; segment starts
+            # only grow, so they cannot overlap any later segment either
+            while active and active[0][0] <= seg_start:
+                heapq.heappop(active)
+
+            # Accumulate overlap per speaker over the live turns, in start order so
+            # ties still go to the earliest speaker
+            overlaps = {}
+            for k in sorted(k for _, k in active):
+                overlap = min(seg_end, dia_ends[k]) - max(seg_start, dia_starts[k])
+                if overlap > 0:
+                    speaker = dia_speakers[k]
+                    overlaps[speaker] = overlaps.get(speaker, 0.0) + overlap
+
+            if overlaps:
+                speaker = max(overlaps, key=overlaps.get)
+            else:
+                speaker = find_nearest_speaker(seg_start, seg_end)
             seg['speaker_label'] = f"[{speaker}] " if speaker else ""
 
         return segments
@@ -105,95 +239,56 @@ class SubtitlePipeline:
         print(f"Start generating subtitles for {filename}...")
         start_time = time.time()
         
-        # Pre-process audio to a single WAV source for consistency
-        temp_wav_path = None
-        try:
-            print("Converting audio to temporary WAV via ffmpeg for consistent processing...")
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-                temp_wav_path = tmp.name
-
-            # Explicit ffmpeg conversion:
-            # - mono (-ac 1)
-            # - 16kHz (-ar 16000)
-            # - disable video (-vn)
-            # - overwrite (-y)
-            cmd = [
-                "ffmpeg",
-                "-y",
-                "-loglevel",
-                "error",
-                "-i",
-                filename,
-                "-ac",
-                "1",
-                "-ar",
-                "16000",
-                "-vn",
-                temp_wav_path,
-            ]
-            try:
-                subprocess.run(cmd, check=True)
-            except FileNotFoundError as e:
-                raise RuntimeError(
-                    "ffmpeg not found in PATH. Please install ffmpeg and ensure it is available as `ffmpeg`."
-                ) from e
-            except subprocess.CalledProcessError as e:
-                raise RuntimeError("ffmpeg failed to convert input to WAV. See ffmpeg output above.") from e
-            
+        # Pre-process audio to a single 16kHz mono waveform for consistency
+        samples = self._load_audio(filename)
+
+        # ASR and diarization are independent, so diarization runs in the
+        # background while Whisper transcribes.
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            diarization_future = None
+            if self.diarizer:
+                print("Running Diarization...")
+                # Pass the SAME waveform
+                diarization_future = executor.submit(self.diarizer.diarize, samples, 16000)
+
             # 1. Transcribe (using ChunkedASR for safety with long files)
-            # Pass the temp wav file instead of original filename
-            result = self.chunked_asr.transcribe(temp_wav_path, self.config.language)
+            result = self.chunked_asr.transcribe_array(samples, 16000, self.config.language)
             segments = result['segments']
             
             # 2. Diarization (Optional)
-            if self.diarizer:
-                print("Running Diarization...")
-                # Pass the SAME temp wav file
-                diarization_result = self.diarizer.diarize(temp_wav_path)
+            if diarization_future:
+                diarization_result = diarization_future.result()
                 segments = self._assign_speakers(segments, diarization_result)
         
-        finally:
-            if temp_wav_path and os.path.exists(temp_wav_path):
-                os.unlink(temp_wav_path)
-        
-        transcripts = []
+        # Collect timing, text and speaker for non-empty segments in a single pass
         regions = []
-        
-        # Pre-process segments for translation
-        processed_segments = []
-        texts_to_translate = []
+        texts = []
+        speakers = []
 
         for segment in segments:
             text = segment.get("text", "")
-            start = segment["start"]
-            end = segment["end"]
-            speaker = segment.get("speaker_label", "")
 
             # Drop empty/whitespace-only segments early (avoids "[SPEAKER_xx]" with no content)
             if not text or not str(text).strip():
                 continue
             
-            processed_segments.append({
-                "start": start,
-                "end": end,
-                "original_text": text,
-                "speaker_label": speaker
-            })
-            texts_to_translate.append(text)
+            regions.append((segment["start"], segment["end"]))
+            texts.append(text)
+            speakers.append(segment.get("speaker_label", ""))
 
         # 3. Batch Translate if enabled
         translated_texts = []
         if self.translator:
-            print(f"Translating {len(texts_to_translate)} segments in parallel...")
-            translated_texts = self.translator.translate_batch(texts_to_translate, self.config.translation.target_language)
+            print(f"Translating {len(texts)} segments in parallel...")
+            translated_texts = self.translator.translate_batch(
+                texts,
+                self.config.translation.target_language,
+                max_workers=self.config.translation.max_concurrent
+            )
 
         # 4. Combine and Format
-        for i, seg in enumerate(processed_segments):
-            start = seg["start"]
-            end = seg["end"]
-            text = seg["original_text"]
-            speaker = seg["speaker_label"]
-            
+        transcripts = []
+        for i, (text, speaker) in enumerate(zip(texts, speakers)):
             if self.translator and i < len(translated_texts):
                 translated_text = translated_texts[i]
                 if self.config.translation.bilingual:
@@ -205,19 +300,16 @@ class SubtitlePipeline:
             else:
                 text = f"{speaker}{text}"
 
-            regions.append((start, end))
             transcripts.append(text)
 
         # Filter out empty subtitles after speaker/translation composition as well
         timed_subtitles = [(r, t) for r, t in zip(regions, transcripts) if t and str(t).strip()]
         
         # Format output
-        formatter = FORMATTERS.get(subtitle_format)
+        formatter = FORMATTERS_STREAM.get(subtitle_format)
         if not formatter:
             print(f"Warning: Format {subtitle_format} not supported, using srt.")
-            formatter = FORMATTERS['srt']
-            
-        formatted_subtitles = formatter(subtitles=timed_subtitles)
+            formatter = FORMATTERS_STREAM['srt']
         
         # Determine output filename
         dest = output
@@ -225,9 +317,9 @@ class SubtitlePipeline:
             base = os.path.splitext(filename)[0]
             dest = "{base}.{format}".format(base=base, format=subtitle_format)
 
-        # Write to file
-        with open(dest, 'wb') as output_file:
-            output_file.write(formatted_subtitles.encode("utf-8"))
+        # Write to file as the subtitles are formatted
+        with open(dest, 'w', encoding='utf-8', newline='') as output_file:
+            formatter(timed_subtitles, output_file)
             
         elapse = time.time() - start_time
         print(f"Subtitle generated at: {dest}")
@@ -1,21 +1,107 @@
 import abc
-from typing import List
+import functools
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
 from concurrent.futures import ThreadPoolExecutor
 
 class BaseTranslator(abc.ABC):
+    # Upper bound on cached translations; least recently used entries are evicted first
+    cache_size = 4096
+
+    def __init__(self):
+        self._executor = None
+        self._executor_workers = 0
+        # (text, target_lang) -> successful translation, shared by all batches of this translator
+        self._cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _get_executor(self, max_workers: int) -> ThreadPoolExecutor:
+        """
+        Return the translator's worker pool, created on first use and reused across batches.
+        """
+        if self._executor is None or self._executor_workers != max_workers:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="translator")
+            self._executor_workers = max_workers
+        return self._executor
+
+    def close(self):
+        """
+        Shut down the worker pool. The translator can still be used afterwards.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            self._executor_workers = 0
+
     @abc.abstractmethod
     def translate(self, text: str, target_lang: str) -> str:
         pass
 
+    def _translate_one(self, text: str, target_lang: str) -> str:
+        """
+        Translate a single line, raising on failure instead of falling back to the
+        source text. Providers whose translate() swallows errors override this so
+        failed lines are not cached.
+        """
+        return self.translate(text, target_lang)
+
+    def _cache_get(self, key: Tuple[str, str]):
+        with self._cache_lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self._cache.move_to_end(key)
+            return value
+
+    def _cache_put(self, key: Tuple[str, str], value: str):
+        with self._cache_lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _translate_cached(self, text: str, target_lang: str) -> str:
+        key = (text, target_lang)
+        value = self._cache_get(key)
+        if value is None:
+            try:
+                value = self._translate_one(text, target_lang)
+            except Exception as e:
+                # Fall back to the source text, but leave it uncached so it is retried
+                print(f"Translation Error: {e}")
+                return text
+            self._cache_put(key, value)
+        return value
+
     def translate_batch(self, texts: List[str], target_lang: str, max_workers: int = 5) -> List[str]:
         """
         Default implementation of batch translation using threads.
         Subclasses can override this for optimized batch APIs.
+
+        Each distinct line is translated once; repeated lines ("Thank you.", "[Music]")
+        and lines already translated in earlier batches are served from the cache.
         """
         if not texts:
             return []
-            
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Map preserves order
-            results = list(executor.map(lambda t: self.translate(t, target_lang), texts))
-        return results
+
+        # Results are collected per call; the shared cache may evict entries or skip failures
+        results: Dict[str, str] = {}
+        unseen = []
+        for text in dict.fromkeys(texts):
+            cached = self._cache_get((text, target_lang))
+            if cached is None:
+                unseen.append(text)
+            else:
+                results[text] = cached
+
+        # Not worth a round-trip through the pool
+        if len(unseen) == 1:
+            results[unseen[0]] = self._translate_cached(unseen[0], target_lang)
+        elif unseen:
+            translate = functools.partial(self._translate_cached, target_lang=target_lang)
+            executor = self._get_executor(max_workers)
+            results.update(zip(unseen, executor.map(translate, unseen)))
+
+        return [results[t] for t in texts]
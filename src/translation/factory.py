@@ -19,7 +19,8 @@ class TranslatorFactory:
             return LLMTranslator(
                 config.api_url,
                 config.model,
-                config.api_key
+                config.api_key,
+                max_connections=config.max_concurrent
             )
         else:
             print(f"Unknown translator provider: {provider}, falling back to Google")
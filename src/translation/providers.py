@@ -1,106 +1,214 @@
 from deep_translator import GoogleTranslator as DeepGoogleTranslator
 from deep_translator import DeeplTranslator
+import functools
+import json
+import re
+import threading
 import requests
-from typing import List
+from typing import Any, Callable, List
 from .base import BaseTranslator
 
+_SYSTEM_PROMPT_TMPL = (
+    "You are a professional subtitle translator. "
+    "Translate the following subtitle lines into {lang}. "
+    "Rules:\n"
+    "1. Maintain the '[index] ' prefix for each line.\n"
+    "2. Translate each line INDIVIDUALLY. Do NOT merge lines.\n"
+    "3. If a line is a sentence fragment, translate it as a fragment.\n"
+    "4. Return exactly {n} lines.\n"
+    "5. Do not output any explanations."
+)
+
+# One "[index] text" line of an LLM response; the text is stripped of surrounding
+# whitespace (including CRs, NBSP and full-width spaces) after matching
+_LLM_LINE_RE = re.compile(r'^\s*\[(\d+)\](.*)$', re.MULTILINE)
+
+# Error bodies that mean the request was too large for the model's context window
+_CONTEXT_LIMIT_RE = re.compile(
+    r'context_length_exceeded|maximum context length|context window|too many tokens|token limit',
+    re.IGNORECASE
+)
+
+@functools.lru_cache(maxsize=64)
+def _normalize_lang(lang: str) -> str:
+    """
+    Map a target language to the code deep-translator's Google client expects.
+    """
+    # deep-translator uses 'zh-CN' format usually
+    if lang.lower() in ('zh', 'zh-cn'):
+        return 'zh-CN'
+    return lang
+
+def _cached_client(local: threading.local, target_lang: str, factory: Callable[[], Any]) -> Any:
+    """
+    Return the calling thread's client for target_lang, creating it on first use.
+
+    deep-translator clients keep per-request state (URL params, payload) on the
+    instance, so one client cannot be shared between translate_batch worker threads.
+    """
+    clients = getattr(local, 'clients', None)
+    if clients is None:
+        clients = local.clients = {}
+    client = clients.get(target_lang)
+    if client is None:
+        client = clients[target_lang] = factory()
+    return client
+
 class GoogleTranslator(BaseTranslator):
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()
+
+    def _translate_one(self, text: str, target_lang: str) -> str:
+        target_lang = _normalize_lang(target_lang)
+        client = _cached_client(
+            self._local, target_lang,
+            lambda: DeepGoogleTranslator(source='auto', target=target_lang)
+        )
+        return client.translate(text)
+
     def translate(self, text: str, target_lang: str) -> str:
         try:
-            # deep-translator uses 'zh-CN' format usually
-            if target_lang.lower() in ['zh', 'zh-cn']:
-                target_lang = 'zh-CN'
-            return DeepGoogleTranslator(source='auto', target=target_lang).translate(text)
+            return self._translate_one(text, target_lang)
         except Exception as e:
             print(f"Google Translation Error: {e}")
             return text
 
 class DeepLTranslator(BaseTranslator):
     def __init__(self, api_key: str):
+        super().__init__()
         self.api_key = api_key
+        self._local = threading.local()
+
+    def _translate_one(self, text: str, target_lang: str) -> str:
+        client = _cached_client(
+            self._local, target_lang,
+            lambda: DeeplTranslator(api_key=self.api_key, source='auto', target=target_lang)
+        )
+        return client.translate(text)
 
     def translate(self, text: str, target_lang: str) -> str:
         try:
-            return DeeplTranslator(api_key=self.api_key, source='auto', target=target_lang).translate(text)
+            return self._translate_one(text, target_lang)
         except Exception as e:
             print(f"DeepL Translation Error: {e}")
             return text
 
 class LLMTranslator(BaseTranslator):
-    def __init__(self, api_url: str, model: str, api_key: str = ""):
+    def __init__(self, api_url: str, model: str, api_key: str = "", max_connections: int = 10):
+        super().__init__()
         self.api_url = api_url
         self.model = model
         self.api_key = api_key
+        # One session for all requests so the connection to the API is kept alive.
+        # The pool must hold a connection per concurrent worker; otherwise surplus
+        # connections are discarded after each request and re-handshaked next time.
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        })
 
     def translate(self, text: str, target_lang: str) -> str:
-        # Simple OpenAI compatible API implementation
-        return self.translate_batch([text], target_lang)[0]
+        # Simple OpenAI compatible API implementation; one line is one request
+        return self._translate_one_chunk([text], target_lang)[0]
 
-    def translate_batch(self, texts: List[str], target_lang: str, max_workers: int = 5) -> List[str]:
+    def translate_batch(self, texts: List[str], target_lang: str, max_workers: int = 5,
+                        max_tokens_in: int = 1500, max_lines: int = 40) -> List[str]:
         """
         Translate a batch of texts using LLM with context.
+        Chunks are independent requests, so they are sent concurrently.
         """
         if not texts:
             return []
 
         # Split into smaller chunks to avoid token limits
-        # 20 lines per chunk is a safe bet for subtitles
-        chunk_size = 20
-        all_translated = []
-
-        for i in range(0, len(texts), chunk_size):
-            chunk = texts[i:i + chunk_size]
-            # Format: [0] Hello\n[1] World
-            input_text = "\n".join([f"[{idx}] {text}" for idx, text in enumerate(chunk)])
+        chunks = self._pack_chunks(texts, max_tokens_in, max_lines)
+
+        executor = self._get_executor(max_workers)
+        # Map preserves order
+        results = list(executor.map(lambda chunk: self._translate_one_chunk(chunk, target_lang), chunks))
+
+        return [line for chunk_result in results for line in chunk_result]
+
+    def _pack_chunks(self, texts: List[str], max_tokens_in: int, max_lines: int) -> List[List[str]]:
+        """
+        Greedily pack lines into chunks bounded by an estimated input token budget
+        and a maximum line count, so short lines share a request and long lines
+        do not overflow the model's output.
+        """
+        chunks = []
+        current_chunk = []
+        current_tokens = 0
+        for text in texts:
+            # Rough rule of thumb: ~4 characters per token, plus the "[index] " prefix
+            est = len(text) // 4 + 2
+            if current_chunk and (current_tokens + est > max_tokens_in or len(current_chunk) >= max_lines):
+                chunks.append(current_chunk)
+                current_chunk = []
+                current_tokens = 0
+            current_chunk.append(text)
+            current_tokens += est
+        if current_chunk:
+            chunks.append(current_chunk)
+        return chunks
+
+    def _translate_one_chunk(self, chunk: List[str], target_lang: str) -> List[str]:
+        """
+        Translate one chunk of lines in a single LLM request.
+        Falls back to the original text for lines missing from the response.
+        """
+        # Format: [0] Hello\n[1] World
+        input_text = "\n".join([f"[{idx}] {text}" for idx, text in enumerate(chunk)])
+        
+        system_prompt = _SYSTEM_PROMPT_TMPL.format(lang=target_lang, n=len(chunk))
+
+        data = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": input_text}
+            ],
+            "temperature": 0.1
+        }
+        
+        try:
+            # Serialize once as UTF-8; the session already carries the JSON and auth headers
+            payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            response = self.session.post(self.api_url, data=payload, timeout=60)
+
+            # Request too large for the context window, or output cut off at the
+            # token limit: halve the chunk and translate each half separately.
+            # Any other 400 would fail the same way for every half, so it is not retried.
+            if (response.status_code == 400 and len(chunk) > 1
+                    and _CONTEXT_LIMIT_RE.search(response.text)):
+                return self._translate_halves(chunk, target_lang)
+            response.raise_for_status()
+            result = response.json()
+            choice = result['choices'][0]
+            if choice.get('finish_reason') == 'length' and len(chunk) > 1:
+                return self._translate_halves(chunk, target_lang)
+
+            content = choice['message']['content'].strip()
             
-            system_prompt = (
-                f"You are a professional subtitle translator. "
-                f"Translate the following subtitle lines into {target_lang}. "
-                f"Rules:\n"
-                f"1. Maintain the '[index] ' prefix for each line.\n"
-                f"2. Translate each line INDIVIDUALLY. Do NOT merge lines.\n"
-                f"3. If a line is a sentence fragment, translate it as a fragment.\n"
-                f"4. Return exactly {len(chunk)} lines.\n"
-                f"5. Do not output any explanations."
-            )
-
-            data = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": input_text}
-                ],
-                "temperature": 0.1
-            }
+            # Parse the output
+            chunk_results = {int(m.group(1)): m.group(2).strip() for m in _LLM_LINE_RE.finditer(content)}
             
-            try:
-                response = requests.post(self.api_url, headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {self.api_key}"
-                }, json=data)
-                response.raise_for_status()
-                result = response.json()
-                content = result['choices'][0]['message']['content'].strip()
+            # Fill in missing translations with original text
+            return [chunk_results.get(idx, chunk[idx]) for idx in range(len(chunk))]
                 
-                # Parse the output
-                chunk_results = {}
-                for line in content.split('\n'):
-                    line = line.strip()
-                    if line.startswith('[') and ']' in line:
-                        try:
-                            idx_str = line[1:line.index(']')]
-                            text_content = line[line.index(']')+1:].strip()
-                            chunk_results[int(idx_str)] = text_content
-                        except ValueError:
-                            continue
-                
-                # Fill in missing translations with original text
-                for idx in range(len(chunk)):
-                    all_translated.append(chunk_results.get(idx, chunk[idx]))
-                    
-            except Exception as e:
-                print(f"LLM Batch Translation Error: {e}")
-                # Fallback to original text on error
-                all_translated.extend(chunk)
-                
-        return all_translated
+        except Exception as e:
+            print(f"LLM Batch Translation Error: {e}")
+            # Fallback to original text on error
+            return list(chunk)
+
+    def _translate_halves(self, chunk: List[str], target_lang: str) -> List[str]:
+        """
+        Retry a chunk that hit the model's token limit as two smaller requests.
+        """
+        print(f"LLM chunk of {len(chunk)} lines hit the token limit, splitting it in half.")
+        half = len(chunk) // 2
+        return self._translate_one_chunk(chunk[:half], target_lang) + self._translate_one_chunk(chunk[half:], target_lang)
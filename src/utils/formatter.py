@@ -1,51 +1,121 @@
-import pysrt
+import io
 import json
-from typing import List, Tuple, Any
+from typing import Callable, List, Tuple, Any, TextIO
+
+def _format_ts(t: float, sep: str = ',') -> str:
+    """
+    Format seconds as a subtitle timestamp (HH:MM:SS,mmm; VTT uses '.' as separator).
+    """
+    ms = int(round(t * 1000))
+    s, ms = divmod(ms, 1000)
+    m, s = divmod(s, 60)
+    h, m = divmod(m, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}{sep}{ms:03d}"
+
+
+def _serialize(subtitles: List[Tuple[Tuple[float, float], str]], file: TextIO, padding_before: float, padding_after: float, ts_sep: str) -> None:
+    """
+    Write numbered cues (index, timing line, text) separated by blank lines.
+    Shared by the SRT and VTT formatters, which differ only in the timestamp separator.
+    """
+    # Write the pieces straight into the buffer rather than assembling each cue first
+    write = file.write
+    for i, ((start, end), text) in enumerate(subtitles, start=1):
+        if i > 1:
+            write('\n')
+        write(str(i))
+        write('\n')
+        write(_format_ts(max(0, start - padding_before), ts_sep))
+        write(' --> ')
+        write(_format_ts(end + padding_after, ts_sep))
+        write('\n')
+        write(str(text))
+        write('\n')
+
+
+def srt_stream_formatter(subtitles: List[Tuple[Tuple[float, float], str]], file: TextIO, padding_before: float = 0, padding_after: float = 0) -> None:
+    """
+    Write a list of subtitles to a file according to the SRT format, with optional time padding.
+    """
+    _serialize(subtitles, file, padding_before, padding_after, ts_sep=',')
+
+
+def vtt_stream_formatter(subtitles: List[Tuple[Tuple[float, float], str]], file: TextIO, padding_before: float = 0, padding_after: float = 0) -> None:
+    """
+    Write a list of subtitles to a file according to the VTT format, with optional time padding.
+    """
+    file.write('WEBVTT\n\n')
+    _serialize(subtitles, file, padding_before, padding_after, ts_sep='.')
+
+
+def json_stream_formatter(subtitles: List[Tuple[Tuple[float, float], str]], file: TextIO) -> None:
+    """
+    Write a list of subtitles to a file as a JSON blob.
+
+    Produces the same layout as json.dumps(..., indent=2) but writes each entry as it
+    goes, so no intermediate list of dicts is built and only values need encoding.
+    """
+    if not subtitles:
+        file.write('[]')
+        return
+
+    write = file.write
+    write('[')
+    for i, ((start, end), text) in enumerate(subtitles):
+        write(',\n  {\n' if i else '\n  {\n')
+        write(f'    "start": {json.dumps(start)},\n')
+        write(f'    "end": {json.dumps(end)},\n')
+        write(f'    "content": {json.dumps(text, ensure_ascii=False)}\n')
+        write('  }')
+    write('\n]')
+
+
+def raw_stream_formatter(subtitles: List[Tuple[Tuple[float, float], str]], file: TextIO) -> None:
+    """
+    Write a list of subtitles to a file as a newline-delimited string.
+    """
+    write = file.write
+    for i, (_rng, text) in enumerate(subtitles):
+        if i:
+            write(' ')
+        write(text)
+
+
+def _to_string(stream_formatter: Callable[..., None], subtitles: List[Tuple[Tuple[float, float], str]], **kwargs: Any) -> str:
+    """
+    Run a stream formatter into an in-memory buffer and return the result.
+    """
+    buf = io.StringIO()
+    stream_formatter(subtitles, buf, **kwargs)
+    return buf.getvalue()
+
 
 def srt_formatter(subtitles: List[Tuple[Tuple[float, float], str]], padding_before: float = 0, padding_after: float = 0) -> str:
     """
     Serialize a list of subtitles according to the SRT format, with optional time padding.
     """
-    sub_rip_file = pysrt.SubRipFile()
-    for i, ((start, end), text) in enumerate(subtitles, start=1):
-        item = pysrt.SubRipItem()
-        item.index = i
-        item.text = str(text)
-        item.start.seconds = max(0, start - padding_before)
-        item.end.seconds = end + padding_after
-        sub_rip_file.append(item)
-    return '\n'.join(str(item) for item in sub_rip_file)
+    return _to_string(srt_stream_formatter, subtitles, padding_before=padding_before, padding_after=padding_after)
 
 
 def vtt_formatter(subtitles: List[Tuple[Tuple[float, float], str]], padding_before: float = 0, padding_after: float = 0) -> str:
     """
     Serialize a list of subtitles according to the VTT format, with optional time padding.
     """
-    text = srt_formatter(subtitles, padding_before, padding_after)
-    text = 'WEBVTT\n\n' + text.replace(',', '.')
-    return text
+    return _to_string(vtt_stream_formatter, subtitles, padding_before=padding_before, padding_after=padding_after)
 
 
 def json_formatter(subtitles: List[Tuple[Tuple[float, float], str]]) -> str:
     """
     Serialize a list of subtitles as a JSON blob.
     """
-    subtitle_dicts = [
-        {
-            'start': start,
-            'end': end,
-            'content': text,
-        }
-        for ((start, end), text) in subtitles
-    ]
-    return json.dumps(subtitle_dicts, ensure_ascii=False, indent=2)
+    return _to_string(json_stream_formatter, subtitles)
 
 
 def raw_formatter(subtitles: List[Tuple[Tuple[float, float], str]]) -> str:
     """
     Serialize a list of subtitles as a newline-delimited string.
     """
-    return ' '.join(text for (_rng, text) in subtitles)
+    return _to_string(raw_stream_formatter, subtitles)
 
 
 FORMATTERS = {
@@ -54,3 +124,10 @@ FORMATTERS = {
     'json': json_formatter,
     'raw': raw_formatter,
 }
+
+FORMATTERS_STREAM = {
+    'srt': srt_stream_formatter,
+    'vtt': vtt_stream_formatter,
+    'json': json_stream_formatter,
+    'raw': raw_stream_formatter,
+}